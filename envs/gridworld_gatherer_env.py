@@ -155,6 +155,9 @@ class GridworldGathererEnv(AsaEnv, Serializable):
             "#.........................#..............#GGGGGGGGGGGGGGGGGGGGGGGGG#",
             "####################################################################"
            ]
+    MAP_ROWS = len(MAP)
+    MAP_COLS = len(MAP[0])
+    BLOCKED_MAP = np.isin(np.array([list(row) for row in MAP]), list('#WXx'))  # tiles agent cannot enter
 
     STEP_PENALTY = 0
 
@@ -1,3 +1,4 @@
+import math
 import os
 
 import matplotlib
@@ -108,6 +109,10 @@ class MinibotEnv(AsaEnv, Serializable):
     map_colors = ['maroon', 'midnightblue', 'darkgreen', 'darkgoldenrod']
     EPSILON = 0.0001
     STEP_PENALTY = 0.05
+    # Tile types encoded as small integers, see self.padded_int_maps
+    TILE_FREE, TILE_WALL, TILE_HOLE, TILE_GOAL, TILE_START = range(5)
+    TILE_CODES = {'F': TILE_FREE, 'W': TILE_WALL, 'H': TILE_HOLE, 'G': TILE_GOAL, 'S': TILE_START}
+    TILE_ALIASES = {'F': 'F. ', 'W': 'WX#', 'H': 'HO', 'G': 'G', 'S': 'S'}  # upper-case chars used in maps legend
     metadata = {'render.modes': ['rgb_array']}
 
 
@@ -129,18 +134,32 @@ class MinibotEnv(AsaEnv, Serializable):
 
         self.radar_range = radar_range
         self.radar_resolution = radar_resolution
+        # Radar measurement points in agent`s frame of reference, shape (2, (2*radar_range+1)^2)
+        bound = radar_range * radar_resolution
+        ls = np.linspace(-bound, bound, 2 * radar_range + 1)
+        xx, yy = np.meshgrid(ls, ls)
+        self._radar_offsets = np.array([xx.flatten(), yy.flatten()])
         self.discretized = discretized
         if states_cache is None:
             self.states_cache = dict()
         else:
             self.states_cache = states_cache
+        self._states_lists = dict()  # observation -> list of states, memoized from self.states_cache
         self.agent_width = 2.4/np.pi
         self.max_action_distance = 0.2
+        # Relative moves for all discretized actions, indexed by [left motor + 1][right motor + 1]
+        self._discrete_moves = [[self._get_relative_move(al * self.max_action_distance, ar * self.max_action_distance)
+                                 for ar in (-1, 0, 1)]
+                                for al in (-1, 0, 1)]
         self.do_render_init = True
         self.render_prev_pos = np.zeros(2)
         self.do_caching = True
 
         self.current_map_idx = None
+        self._cur_map = None
+        self._cur_padded_int_map = None
+        self._cur_padded_bit_map = None
+        self._cur_y0_row = None
         self.agent_pos = None
         self.agent_ori = None
 
@@ -152,17 +171,36 @@ class MinibotEnv(AsaEnv, Serializable):
             raw_maps = [self.all_maps[i] for i in use_maps]
         self.maps = []
         self.bit_maps = []
+        self.start_tiles = []
+        self.padded_int_maps = []
+        self.padded_bit_maps = []
+        # Maps are padded with walls wide enough to contain all radar measurements, so that lookups never go
+        # out of bounds
+        self.map_padding = int(np.ceil(np.sqrt(2) * radar_range * radar_resolution)) + 1
+        # Lookup tables: ASCII code of map character -> tile code -> normalized char
+        unknown_tile = 255
+        code_lut = np.full(256, unknown_tile, dtype=np.uint8)
+        for tile, chars in self.TILE_ALIASES.items():
+            code_lut[[ord(ch) for ch in chars]] = self.TILE_CODES[tile]
+        char_lut = np.array(sorted(self.TILE_CODES, key=self.TILE_CODES.get))
         for i in range(len(raw_maps)):
-            # Normalize char map
-            m = np.array([list(row.upper()) for row in raw_maps[i]])
-            m[np.logical_or(m == '.', m == ' ')] = 'F'
-            m[np.logical_or(m == 'X', m == '#')] = 'W'
-            m[m == 'O'] = 'H'
+            # Make integer map of tile codes
+            if len(set(map(len, raw_maps[i]))) != 1:
+                raise ValueError('Map {} has rows of different lengths'.format(i))
+            raw = np.frombuffer(''.join(raw_maps[i]).upper().encode('ascii'), dtype=np.uint8)
+            im = code_lut[raw].reshape(len(raw_maps[i]), -1)
+            if np.any(im == unknown_tile):
+                raise ValueError('Map {} contains unknown tile type'.format(i))
+            self.start_tiles.append(tuple(np.argwhere(im == self.TILE_START)[0]))
+            # Make normalized char map
+            m = char_lut[im]
             self.maps.append(m)
             # Make bit map
-            bm = np.zeros(m.shape)
-            bm[np.logical_or(m == 'W', m == 'H')] = 1
+            bm = np.isin(im, [self.TILE_WALL, self.TILE_HOLE]).astype(np.float64)
             self.bit_maps.append(bm)
+            # Make padded maps
+            self.padded_int_maps.append(np.pad(im, self.map_padding, mode='constant', constant_values=self.TILE_WALL))
+            self.padded_bit_maps.append(np.pad(bm, self.map_padding, mode='constant', constant_values=1))
 
 
     @property
@@ -187,18 +225,16 @@ class MinibotEnv(AsaEnv, Serializable):
         Get what agent can see (up to radar_range distance), rotated according
         to agent`s orientation.
         """
-        bound = self.radar_range * self.radar_resolution
-        ls = np.linspace(-bound, bound, 2 * self.radar_range + 1)
-        xx, yy = np.meshgrid(ls, ls)
-        points = np.array([xx.flatten(), yy.flatten()])
         # Transform points from agent`s coordinates to world coordinates
-        r = self._rotation_matrix(self.agent_ori)
-        points = self.agent_pos + (r @ points).T
-        # Fill in observation vector
-        obs = np.zeros(points.shape[0])
-        for i, point in enumerate(points):
-            obs[i] = self._tile_type_at_pos(point, bitmap=True)
-        return obs
+        px, py = self._radar_offsets
+        cos = math.cos(self.agent_ori)
+        sin = math.sin(self.agent_ori)
+        xs = self.agent_pos[0] + cos * px - sin * py
+        ys = self.agent_pos[1] + sin * px + cos * py
+        # Fill in observation vector: gather all measurements from padded bitmap at once
+        rs = self._cur_y0_row - np.rint(ys).astype(np.intp)
+        cs = np.rint(xs).astype(np.intp) + self.map_padding
+        return self._cur_padded_bit_map[rs, cs]
 
 
     @overrides
@@ -207,9 +243,8 @@ class MinibotEnv(AsaEnv, Serializable):
         Choose random map for this rollout, initialize agent facing north.
         """
         self.do_render_init = True
-        self.current_map_idx = np.random.choice(len(self.maps))
-        m = self.maps[self.current_map_idx]
-        (start_r,), (start_c,) = np.nonzero(m == 'S')
+        self._set_current_map(np.random.choice(len(self.maps)))
+        start_r, start_c = self.start_tiles[self.current_map_idx]
         self.agent_pos = self._rc_to_xy([start_r, start_c])
         self.agent_ori = 0
         return self.get_current_obs()
@@ -222,10 +257,14 @@ class MinibotEnv(AsaEnv, Serializable):
         """
         self.do_render_init = True
         k = tuple(np.array(start_obs, dtype='int8'))
-        states = list(self.states_cache[k])
+        states = self._states_lists.get(k)
+        if states is None or len(states) != len(self.states_cache[k]):
+            # states_cache entries only grow, so a length change means the memoized list is outdated
+            states = list(self.states_cache[k])
+            self._states_lists[k] = states
         m_idx, pos, ori = states[np.random.randint(len(states))]
         pos = np.array(pos)
-        self.current_map_idx = m_idx
+        self._set_current_map(m_idx)
         self.agent_pos = pos
         self.agent_ori = ori
         return self.get_current_obs()
@@ -246,14 +285,14 @@ class MinibotEnv(AsaEnv, Serializable):
         self.agent_ori = next_ori
         obs = self.get_current_obs()
         # Determine reward and termination
-        next_state_type = self._tile_type_at_pos(next_pos)
-        if next_state_type == 'H':
+        next_state_type = self._tile_code_at_pos(next_pos)
+        if next_state_type == self.TILE_HOLE:
             done = True
             reward = -1
-        elif next_state_type in ['F', 'S']:
+        elif next_state_type == self.TILE_FREE or next_state_type == self.TILE_START:
             done = False
             reward = -self.STEP_PENALTY
-        elif next_state_type == 'G':
+        elif next_state_type == self.TILE_GOAL:
             done = True
             reward = 1
         else:
@@ -349,47 +388,55 @@ class MinibotEnv(AsaEnv, Serializable):
         Does not change the agent`s position
         :return: tuple(position, orientation)
         """
-        pos0 = self.agent_pos
-        ori0 = self.agent_ori
         move_vector, ori_change = self._get_raw_move(action)
-        pos1 = pos0 + move_vector
-        ori1 = ori0 + ori_change
-
-        # Collision detection
-        t0 = np.round(pos0)  # starting tile
-        t1 = np.round(pos1)  # ending tile
-        if self._tile_type_at_pos(pos1) != 'W':  # no collision (t1=='W' also implies t1 != t0)
-            return pos1, ori1
-
-        dtx = t0[0] != t1[0]  # was tile changed in x-direction
-        dty = t0[1] != t1[1]  # was tile changed in y-direction
-        mid_x, mid_y = (t0 + t1) / 2
-        near_wall_x = mid_x - np.sign(move_vector[0]) * 0.01
-        near_wall_y = mid_y - np.sign(move_vector[1]) * 0.01
+        x0, y0 = self.agent_pos
+        x1, y1 = self._resolve_collision(float(x0), float(y0), float(move_vector[0]), float(move_vector[1]))
+        return np.array([x1, y1]), self.agent_ori + ori_change
+
+
+    def _resolve_collision(self, x0, y0, mx, my):
+        """
+        Move from position (x0, y0) by vector (mx, my), stopping right in front of a wall if one is hit.
+        Computed with plain scalar arithmetic, as it runs in every step.
+        :return: tuple(x, y) of new position
+        """
+        x1 = x0 + mx
+        y1 = y0 + my
+        if not self._is_wall_at(x1, y1):  # no collision (t1=='W' also implies t1 != t0)
+            return x1, y1
+
+        t0x, t0y = round(x0), round(y0)  # starting tile
+        t1x, t1y = round(x1), round(y1)  # ending tile
+        dtx = t0x != t1x  # was tile changed in x-direction
+        dty = t0y != t1y  # was tile changed in y-direction
+        mid_x = (t0x + t1x) / 2
+        mid_y = (t0y + t1y) / 2
+        near_wall_x = mid_x - ((mx > 0) - (mx < 0)) * 0.01
+        near_wall_y = mid_y - ((my > 0) - (my < 0)) * 0.01
         if dtx and not dty:  # bumped into wall E/W
-            pos1[0] = near_wall_x
-            return pos1, ori1
+            return near_wall_x, y1
         if dty and not dtx:  # bumped into wall N/S
-            pos1[1] = near_wall_y
-            return pos1, ori1
+            return x1, near_wall_y
 
         # now we know: t1=='W', dtx, dty ... i.e. we moved diagonally, traversing another tile either on E/W xor on N/S
-        t_ew_wall = self._tile_type_at_pos((t1[0], t0[1])) == 'W'
-        t_ns_wall = self._tile_type_at_pos((t0[0], t1[1])) == 'W'
+        # both tiles are already rounded, so probe them directly in padded map
+        m = self._cur_padded_int_map
+        off = self.map_padding
+        t_ew_wall = m[self._cur_y0_row - t0y, t1x + off] == self.TILE_WALL
+        t_ns_wall = m[self._cur_y0_row - t1y, t0x + off] == self.TILE_WALL
         if not t_ew_wall  and  not t_ns_wall:
-            tx = (mid_x - pos0[0]) / (pos1[0] - pos0[0])
-            ty = (mid_y - pos0[1]) / (pos1[1] - pos0[1])
+            tx = (mid_x - x0) / mx
+            ty = (mid_y - y0) / my
             if tx < ty:  # traveled through empty tile on E/W, bumped into wall on N/S
-                pos1[1] = near_wall_y
-            else:            # traveled through empty tile on N/S, bumped into wall on E/W
-                pos1[0] = near_wall_x
-            return pos1, ori1
+                return x1, near_wall_y
+            else:        # traveled through empty tile on N/S, bumped into wall on E/W
+                return near_wall_x, y1
         if t_ew_wall:  # bumped into wall on E/W
-            pos1[0] = near_wall_x
+            x1 = near_wall_x
         if t_ns_wall:  # bumped into wall on N/S
-            pos1[1] = near_wall_y
+            y1 = near_wall_y
         # combination of last two: bumped into corner
-        return pos1, ori1
+        return x1, y1
 
 
     def _get_raw_move(self, action):
@@ -399,54 +446,62 @@ class MinibotEnv(AsaEnv, Serializable):
         2) orientation change
         Does not handle collisions, nor does it actually changes agent`s position.
         """
-        al, ar = action * self.max_action_distance  # scale motor power <-1,1> to actual distance <-0.2,0.2>
-        w = self.agent_width
+        if self.discretized:
+            # action is from [-1, 0, 1]^2, use pre-computed move
+            rel_x, rel_y, ori_change = self._discrete_moves[int(action[0]) + 1][int(action[1]) + 1]
+        else:
+            al, ar = action * self.max_action_distance  # scale motor power <-1,1> to actual distance <-0.2,0.2>
+            rel_x, rel_y, ori_change = self._get_relative_move(al, ar)
+        if rel_x == 0 and rel_y == 0:
+            # Agent stands still or rotates in place, nothing to rotate
+            return np.zeros(2), ori_change
+        # Rotate to world coordinates
+        cos = math.cos(self.agent_ori)
+        sin = math.sin(self.agent_ori)
+        absolute_move_vector = np.array([cos * rel_x - sin * rel_y, sin * rel_x + cos * rel_y])
+        return absolute_move_vector, ori_change
 
-        if np.abs(al - ar) < self.EPSILON:
+
+    def _get_relative_move(self, al, ar):
+        """
+        Computes move in agent`s frame of reference, given distances traveled by left and right wheel.
+        :return: tuple(x, y, orientation change)
+        """
+        w = self.agent_width
+        if abs(al - ar) < self.EPSILON:
             # al == ar -> Agent moves in straight line
-            relative_move_vector = np.array([0, al])
+            rel_x, rel_y = 0, al
             ori_change = 0
-        elif np.abs(al + ar) < self.EPSILON:
+        elif abs(al + ar) < self.EPSILON:
             # al == -ar -> Agent rotates in place
-            relative_move_vector = np.array([0, 0])
+            rel_x, rel_y = 0, 0
             ori_change = ar * 2 / w
         else:
             # Agent moves and rotates at the same time
             r = (w * (ar + al)) / (2 * (ar - al))
             alpha = (ar + al) / (2 * r)
-            me_pos = np.array([0, 0])  # agent`s position in his frame of reference
-            rot_center = np.array([-r, 0])
-            me_pos = me_pos - rot_center                      # 1) move to rotation center
-            me_pos = self._rotation_matrix(alpha) @ me_pos    # 2) rotate
-            me_pos = me_pos + rot_center                      # 3) move back
-            # Vector me_pos now represents in which direction the agent should move !!! in his frame of reference !!!
-            relative_move_vector = me_pos
+            # Agent`s position [0, 0] is moved to rotation center [-r, 0], rotated by alpha, and moved back.
+            # Resulting vector represents in which direction the agent should move !!! in his frame of reference !!!
+            rel_x = r * math.cos(alpha) - r
+            rel_y = r * math.sin(alpha)
             ori_change = alpha
-        absolute_move_vector = self._rotation_matrix(self.agent_ori) @ relative_move_vector
-        return absolute_move_vector, ori_change
+        return rel_x, rel_y, ori_change
 
 
-    @staticmethod
-    def _rotation_matrix(alpha):
+    def _tile_code_at_pos(self, position):
         """
-        2-D rotation matrix for column-vectors (i.e. usage: x' = R @ x).
+        Return integer code (see TILE_CODES) of a tile at given X,Y position. Positions outside of the map are walls.
         """
-        sin = np.sin(alpha)
-        cos = np.cos(alpha)
-        return np.array([[cos, -sin], [sin, cos]])
+        x, y = position
+        return self._cur_padded_int_map[self._cur_y0_row - int(round(y)), int(round(x)) + self.map_padding]
 
 
-    def _tile_type_at_pos(self, position, bitmap=False):
+    def _is_wall_at(self, x, y):
         """
-        Return type of a tile at given X,Y position.
+        Return whether there is a wall at given X,Y position. Positions outside of the map are walls.
         """
-        m = self._get_current_map(bitmap)
-        rows, cols = m.shape
-        x, y = np.round(position)
-        r, c = self._xy_to_rc([x, y])
-        if r < 0 or c < 0 or r >= rows or c >= cols:
-            return 1 if bitmap else 'W'
-        return m[r, c]
+        return self._cur_padded_int_map[self._cur_y0_row - int(round(y)), int(round(x)) + self.map_padding] \
+            == self.TILE_WALL
 
 
     def _rc_to_xy(self, pos, rows=None):
@@ -460,22 +515,21 @@ class MinibotEnv(AsaEnv, Serializable):
             rows, _ = self._get_current_map().shape
         return np.array([c, rows - r - 1])
 
-    def _xy_to_rc(self, pos, rows=None):
+
+    def _set_current_map(self, map_idx):
         """
-        Get position as [row, column], instead of [X,Y]. Original [X,Y] position will be rounded to nearest tile.
-        :param pos: (x,y) position
-        :param rows: number of rows in a map, or None (current map is used)
+        Switch to map with given index, and cache its (bit)maps for fast access.
         """
-        x, y = np.round(pos)
-        if rows is None:
-            rows, _ = self._get_current_map().shape
-        return np.array([rows - y - 1, x], dtype='int32')
+        self.current_map_idx = map_idx
+        self._cur_map = self.maps[map_idx]
+        self._cur_padded_int_map = self.padded_int_maps[map_idx]
+        self._cur_padded_bit_map = self.padded_bit_maps[map_idx]
+        # row of padded map, in which tiles with Y coordinate = 0 lie
+        self._cur_y0_row = self._cur_map.shape[0] + self.map_padding - 1
 
 
-    def _get_current_map(self, bitmap=False):
+    def _get_current_map(self):
         """
-        Return current map, or bitmap (for observations).
+        Return current (char) map.
         """
-        if bitmap:
-            return self.bit_maps[self.current_map_idx]
-        return self.maps[self.current_map_idx]
+        return self._cur_map
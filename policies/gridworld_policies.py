@@ -13,6 +13,11 @@ class GridworldTargetPolicy(Policy, Serializable):
     takes the shortest route, but only does very primitive obstacle avoidance.
     """
 
+    # Action for each move (row, column), indexed by (3 * (row + 1) + column + 1)
+    MOVE_ACTIONS = (None, 0, None,
+                    3,    0, 1,     # when agent is already on target tile, go up
+                    None, 2, None)
+
     def __init__(self, env_spec, target):
         """
         :param target: [row, column] of target tile
@@ -22,31 +27,26 @@ class GridworldTargetPolicy(Policy, Serializable):
         super().__init__(env_spec=env_spec)
 
     def get_action(self, observation):
-        moves = {(-1,  0): 0,
-                 ( 0,  1): 1,
-                 ( 1,  0): 2,
-                 ( 0, -1): 3,
-                 ( 0,  0): 0  # when agent is already on target tile, go up
-                }
-        pos = np.asarray(observation[:2], dtype='int32')
+        pos_r, pos_c = int(observation[0]), int(observation[1])
 
         # Get primary & secondary moves
-        delta = self.target - pos
-        abs_d = np.abs(delta)
-        move_r, move_c = np.diag( delta // np.maximum(abs_d, [1, 1]) )
-        move_1, move_2 = (move_r, move_c) if abs_d[0] >= abs_d[1] else (move_c, move_r)
+        delta_r = int(self.target[0]) - pos_r
+        delta_c = int(self.target[1]) - pos_c
+        move_r = ((delta_r > 0) - (delta_r < 0), 0)
+        move_c = (0, (delta_c > 0) - (delta_c < 0))
+        move_1, move_2 = (move_r, move_c) if abs(delta_r) >= abs(delta_c) else (move_c, move_r)
 
         # If primary move goes out of map / into wall, use secondary move
-        next_pos = pos + move_1
-        m = GridworldGathererEnv.MAP
-        if np.min(next_pos) < 0  \
-           or  next_pos[0] >= len(m)  \
-           or  next_pos[1] >= len(m[0])  \
-           or  m[next_pos[0]][next_pos[1]] in '#WXx':
-            if tuple(move_2) != (0, 0):  # If secondary move is not doing anything, use the primary move (will stop the skill)
+        next_r = pos_r + move_1[0]
+        next_c = pos_c + move_1[1]
+        if min(next_r, next_c) < 0  \
+           or  next_r >= GridworldGathererEnv.MAP_ROWS  \
+           or  next_c >= GridworldGathererEnv.MAP_COLS  \
+           or  GridworldGathererEnv.BLOCKED_MAP[next_r, next_c]:
+            if move_2 != (0, 0):  # If secondary move is not doing anything, use the primary move (will stop the skill)
                 move_1 = move_2
 
-        return moves[tuple(move_1)], dict()
+        return self.MOVE_ACTIONS[3 * (move_1[0] + 1) + move_1[1] + 1], dict()
 
     def get_params_internal(self, **tags):
         return []
@@ -4,6 +4,21 @@ from garage.spaces import Discrete
 import numpy as np
 
 
+def _obs_key(obs):
+    """
+    Hashable key of an observation, such that two observations have the same key iff they are equal.
+    """
+    return (np.asarray(obs, dtype=np.float64) + 0.0).tobytes()  # adding 0.0 converts -0.0 to 0.0
+
+
+def _always_false(path):
+    """
+    Default stopping function, skill is never stopped prematurely.
+    """
+    return False
+
+
+
 class HierarchicalPolicy(Serializable):
     """
     Wrapper for hierarchical policy containing top-level and skill policies.
@@ -33,14 +48,20 @@ class HierarchicalPolicy(Serializable):
         self.skill_policies = skill_policies
         self.skill_max_timesteps = skill_max_timesteps
         num_orig_skills = len(skill_policies)
+        self._num_orig_skills = num_orig_skills
+        self._num_skills = num_orig_skills
 
-        # pad _skills_end_obss to align indexes with skill_policies
-        self._skills_end_obss = [None for _ in range(num_orig_skills)]
+        # End observations of all created skills, stored contiguously in one array. Skill i has end observations
+        # _end_obss_flat[_end_obss_offsets[i] : _end_obss_offsets[i+1]], offsets are padded for original skills.
+        self._end_obss_flat = None
+        self._end_obss_offsets = [0 for _ in range(num_orig_skills + 1)]
 
         # if _skill_stop_functions is not provided, default stopping function (return False) is assigned to all
         self._skill_stop_functions = skill_stop_functions if skill_stop_functions is not None \
-                                     else [lambda path: False for _ in range(num_orig_skills)]
-        assert(len(self._skill_stop_functions) == num_orig_skills)
+                                     else [_always_false] * num_orig_skills
+        if len(self._skill_stop_functions) != num_orig_skills:
+            raise ValueError('Number of skill stopping functions ({}) must match number of skill policies ({}).'
+                             .format(len(self._skill_stop_functions), num_orig_skills))
 
         # Check top-level policy
         if not isinstance(top_policy.action_space, Discrete) \
@@ -49,7 +70,7 @@ class HierarchicalPolicy(Serializable):
 
     @property
     def num_skills(self):
-        return len(self.skill_policies)
+        return self._num_skills
 
     def get_top_policy(self):
         """
@@ -69,9 +90,11 @@ class HierarchicalPolicy(Serializable):
     def get_skill_stopping_func(self, i):
         """
         :param i: Number of skill
-        :return: function ({actions, observations} -> bool) that indicates that skill execution is done
+        :return: function ({actions, observations} -> bool) that indicates that skill execution is done, or None if
+                 the skill has no stopping function (it runs until skill_max_timesteps or end of episode)
         """
-        return self._skill_stop_functions[i]
+        stop_func = self._skill_stop_functions[i]
+        return None if stop_func is _always_false else stop_func
 
     def create_new_skill(self, end_obss):
         """
@@ -85,11 +108,36 @@ class HierarchicalPolicy(Serializable):
                 name='{}Skill{}'.format(type(self.skill_policy_prototype).__name__, new_skill_id)
         )
         self.skill_policies.append(new_skill_pol)
-        self._skills_end_obss.append(np.copy(end_obss))
-
-        unique_end_obss = np.unique(self._skills_end_obss[new_skill_id], axis=0)
-        self._skill_stop_functions.append(
-            # lambda path: path['observations'][-1] in self._skills_end_obss[new_skill_id]
-            lambda path: (path['observations'][-1] == unique_end_obss).all(axis=1).any()
-        )
+        self._num_skills += 1
+        end_obss = np.reshape(end_obss, (len(end_obss), -1))
+        compact_end_obss = end_obss.astype(np.uint8)
+        if np.array_equal(compact_end_obss, end_obss):
+            # observations are small non-negative integers (e.g. Minibot radar), store them compactly
+            end_obss = compact_end_obss
+        # concatenation copies end_obss, so the caller`s array is not referenced
+        self._end_obss_flat = np.concatenate([end_obss] if self._end_obss_flat is None
+                                             else [self._end_obss_flat, end_obss])
+        self._end_obss_offsets.append(self._end_obss_flat.shape[0])
+        self._skill_stop_functions.append(self.end_obss_stopping_func(self.get_skill_end_obss(new_skill_id)))
         return new_skill_pol, new_skill_id
+
+    def get_skill_end_obss(self, i):
+        """
+        :param i: Number of skill
+        :return: end observations of skill created by create_new_skill, or None for original skills
+        """
+        if i < self._num_orig_skills:
+            return None
+        return self._end_obss_flat[self._end_obss_offsets[i]:self._end_obss_offsets[i + 1]]
+
+    @staticmethod
+    def end_obss_stopping_func(end_obss):
+        """
+        Create stopping function that terminates the skill upon reaching one of given end observations.
+        End observations are hashed immediately, later changes to end_obss do not affect the function.
+        :param end_obss: tensor of observations where skill should terminate
+        :return: function ({actions, observations} -> bool)
+        """
+        # set of hashed end observations gives O(1) check whether skill should stop
+        end_obs_keys = {_obs_key(end_obs) for end_obs in end_obss}
+        return lambda path: _obs_key(path['observations'][-1]) in end_obs_keys
@@ -83,8 +83,7 @@ def run_task(*_):
                 new_skill_data = dill.load(file)
             new_skill_policy = new_skill_data['policy']
             new_skill_subpath = new_skill_data['subpath']
-            unique_end_obss = np.unique(new_skill_subpath['end_observations'], axis=0)
-            new_skill_stop_func = lambda path: (path['observations'][-1] == unique_end_obss).all(axis=1).any()
+            new_skill_stop_func = HierarchicalPolicy.end_obss_stopping_func(new_skill_subpath['end_observations'])
 
         ## Lower level environment & policies
         # Base (original) environment.
@@ -75,7 +75,7 @@ def run_task(*_):
                 new_skill_data = dill.load(file)
             new_skill_policy = new_skill_data['policy']
             new_skill_subpath = new_skill_data['subpath']
-            new_skill_stop_func = lambda path: path['observations'][-1] in new_skill_subpath['end_observations']
+            new_skill_stop_func = HierarchicalPolicy.end_obss_stopping_func(new_skill_subpath['end_observations'])
 
         ## Lower level environment & policies
         # Base (original) environment.
@@ -14,6 +14,7 @@ class TestBot(MinibotEnv):
     def __init__(self):
         self.agent_width = 2.4/np.pi
         self.max_action_distance = 0.2
+        self.discretized = False
         self.agent_position = np.array([0., 0.])
         self.agent_ori = 0.
 
@@ -20,7 +20,8 @@ def skill_rollout(env,
     :param env: AsaEnv environment to run in
     :param agent: Policy to sample actions from
     :param max_path_length: force terminate the rollout after this many steps
-    :param skill_stopping_func: function ({actions, observations} -> bool) that indicates that skill execution is done
+    :param skill_stopping_func: function ({actions, observations} -> bool) that indicates that skill execution is done.
+           It is given the path so far as lists of per-step observations, actions, rewards, agent_infos and env_infos
     :param reset_start_rollout: whether to reset the env when calling this function
     :param keep_rendered_rgbs: whether to keep a list of all rgb_arrays (for future video making)
     :param animated: whether to render env after each step
@@ -33,6 +34,14 @@ def skill_rollout(env,
     env_infos = []
     terminated = []
     rendered_rgbs = []
+    # Path so far, for skill_stopping_func. Lists are filled in-place, so the dict is created only once.
+    partial_path = dict(
+        observations=observations,
+        actions=actions,
+        rewards=rewards,
+        agent_infos=agent_infos,
+        env_infos=env_infos
+    )
     if reset_start_rollout:
         o = env.reset()
     else:
@@ -58,14 +67,7 @@ def skill_rollout(env,
             break
         terminated.append(0)
         # skill decides to terminate
-        path_dict = dict(
-            observations=tensor_utils.stack_tensor_list(observations),
-            actions=tensor_utils.stack_tensor_list(actions),
-            rewards=tensor_utils.stack_tensor_list(rewards),
-            agent_infos=tensor_utils.stack_tensor_dict_list(agent_infos),
-            env_infos=tensor_utils.stack_tensor_dict_list(env_infos),  # here it concatenates all lower-level paths!
-        )
-        if skill_stopping_func and skill_stopping_func(path_dict):
+        if skill_stopping_func and skill_stopping_func(partial_path):
             break
 
         o = next_o